@@ -0,0 +1,206 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+import queries as q
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Serve dashboard aggregates from a local DuckDB copy of employees (needs duckdb)
+ANALYTICS_REPLICA = bool(st.secrets.get('ANALYTICS_REPLICA', False))
+ANALYTICS_DB_PATH = st.secrets.get('ANALYTICS_DB_PATH', '.cache/analytics.duckdb')
+# New rows are copied incrementally by id; a full copy picks up updates and deletes
+ANALYTICS_REFRESH_SECONDS = int(st.secrets.get('ANALYTICS_REFRESH_SECONDS', 300))
+ANALYTICS_FULL_REFRESH_SECONDS = int(st.secrets.get('ANALYTICS_FULL_REFRESH_SECONDS', 3600))
+# Ids are handed out before commit, so a row can land below the copied MAX(id);
+# incremental copies re-read this many trailing ids to pick such rows up
+ANALYTICS_ID_OVERLAP = int(st.secrets.get('ANALYTICS_ID_OVERLAP', 1000))
+# First retry delay after a failed refresh; doubles up to ANALYTICS_REFRESH_SECONDS
+ANALYTICS_RETRY_SECONDS = 5
+SNAPSHOT_CHUNK_SIZE = 50000
+
+# Postgres aggregate -> equivalent DuckDB query
+REPLICA_QUERIES = {
+    q.TOTAL_EMPLOYEES_SQL: q.TOTAL_EMPLOYEES_SQL,
+    q.AVERAGE_SALARY_SQL: q.AVERAGE_SALARY_SQL,
+    q.EMPLOYEES_PER_DEPARTMENT_SQL: q.EMPLOYEES_PER_DEPARTMENT_SQL,
+    q.HIRES_TIMELINE_SQL: q.HIRES_TIMELINE_SQL,
+    q.HIRES_TIMELINE_BUCKETS_SQL: q.HIRES_TIMELINE_BUCKETS_SQL,
+    q.DEPARTMENT_BREAKDOWN_SQL: q.DEPARTMENT_BREAKDOWN_SQL,
+    q.SALARY_SUMMARY_SQL: q.SALARY_SUMMARY_SQL,
+    q.SALARY_HISTOGRAM_SQL: q.DUCKDB_SALARY_HISTOGRAM_SQL,
+    q.SALARY_BY_DEPARTMENT_SQL: q.SALARY_BY_DEPARTMENT_SQL,
+}
+
+def _duckdb_params(query: str) -> str:
+    """Convert :name binds to DuckDB's $name, leaving :: casts alone."""
+    return re.sub(r'(?<!:):(\w+)', r'$\1', query)
+
+class AnalyticsReplica:
+    """
+    Columnar copy of the employees table in a local DuckDB database.
+
+    Each process keeps its own copy: a DuckDB file can only be opened for
+    writing by one process, so if the file is locked by another replica an
+    in-memory database is used instead.
+    """
+
+    def __init__(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.db = duckdb.connect(path)
+        except duckdb.IOException as e:
+            print(f"⚠️ Analytics database {path} is in use, falling back to memory: {e}")
+            self.db = duckdb.connect()
+        for query in q.DUCKDB_SCHEMA:
+            self.db.execute(query)
+        row = self.db.execute("SELECT last_sync_at, last_full_sync_at FROM sync_state").fetchone()
+        self.last_sync_at, self.last_full_sync_at = row if row else (None, None)
+
+    def _load(self, engine, last_id: int):
+        """Copy employees with id > last_id from Postgres, in chunks."""
+        copied = 0
+        chunks = pd.read_sql_query(
+            text(q.ANALYTICS_SNAPSHOT_SQL), engine,
+            params={'last_id': last_id}, chunksize=SNAPSHOT_CHUNK_SIZE
+        )
+        for chunk in chunks:
+            chunk['salary'] = pd.to_numeric(chunk['salary'])
+            chunk['hire_date'] = pd.to_datetime(chunk['hire_date'])
+            self.db.register('snapshot_chunk', chunk)
+            self.db.execute("INSERT INTO employees SELECT * FROM snapshot_chunk")
+            self.db.unregister('snapshot_chunk')
+            copied += len(chunk)
+        return copied
+
+    def refresh(self, engine, full: bool = False):
+        """
+        Copy new rows from Postgres (or everything, if full). Runs in one
+        DuckDB transaction so readers never see a partial copy.
+        Incremental copies start ANALYTICS_ID_OVERLAP ids below the newest
+        copied row.
+        """
+        now = datetime.now()
+        self.db.execute("BEGIN TRANSACTION")
+        try:
+            if full:
+                self.db.execute("DELETE FROM employees")
+                last_id = 0
+            else:
+                max_id = self.db.execute("SELECT COALESCE(MAX(id), 0) FROM employees").fetchone()[0]
+                last_id = max(max_id - ANALYTICS_ID_OVERLAP, 0)
+                self.db.execute("DELETE FROM employees WHERE id > ?", [last_id])
+            copied = self._load(engine, last_id)
+            self.db.execute("DELETE FROM sync_state")
+            self.db.execute(
+                "INSERT INTO sync_state VALUES (?, ?)",
+                [now, now if full else self.last_full_sync_at]
+            )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+        self.last_sync_at = now
+        if full:
+            self.last_full_sync_at = now
+        print(f"✅ Analytics replica {'fully ' if full else ''}refreshed ({copied} rows copied)")
+
+    def refresh_if_stale(self, engine):
+        """Run a full refresh if one is due, otherwise an incremental one if due."""
+        now = datetime.now()
+        if (self.last_full_sync_at is None
+                or (now - self.last_full_sync_at).total_seconds() > ANALYTICS_FULL_REFRESH_SECONDS):
+            self.refresh(engine, full=True)
+        elif (now - self.last_sync_at).total_seconds() > ANALYTICS_REFRESH_SECONDS:
+            self.refresh(engine)
+
+    def read_sql(self, query: str, params: dict = None) -> pd.DataFrame:
+        """Run the DuckDB equivalent of a Postgres aggregate."""
+        # DuckDB connections aren't thread-safe; each read gets its own cursor
+        cursor = self.db.cursor()
+        try:
+            return cursor.execute(_duckdb_params(REPLICA_QUERIES[query]), params or {}).df()
+        finally:
+            cursor.close()
+
+@st.cache_resource
+def get_analytics_replica():
+    """
+    Get the analytics replica for this process, or None when the replica
+    is turned off or duckdb isn't installed. Runs only once per process.
+    """
+    if not ANALYTICS_REPLICA:
+        return None
+    if duckdb is None:
+        print("⚠️ ANALYTICS_REPLICA is set but duckdb is not installed; using Postgres")
+        return None
+    return AnalyticsReplica(ANALYTICS_DB_PATH)
+
+def _refresh_loop(replica, engine):
+    failures = 0
+    while True:
+        try:
+            replica.refresh_if_stale(engine)
+            failures = 0
+            delay = ANALYTICS_REFRESH_SECONDS
+        except Exception as e:
+            delay = min(ANALYTICS_RETRY_SECONDS * 2 ** failures, ANALYTICS_REFRESH_SECONDS)
+            failures += 1
+            print(f"❌ Error refreshing analytics replica, retrying in {delay}s: {e}")
+        time.sleep(delay)
+
+def start_refresher(engine):
+    """
+    Keep the analytics replica up to date from a background thread, so no
+    page render waits for (or repeats) a copy from Postgres. Does nothing
+    when the replica is not in use.
+    """
+    replica = get_analytics_replica()
+    if replica is None:
+        return None
+    thread = threading.Thread(
+        target=_refresh_loop, args=(replica, engine), name="analytics-refresh", daemon=True
+    )
+    thread.start()
+    print(f"✅ Analytics replica refresher started (every {ANALYTICS_REFRESH_SECONDS}s)")
+    return thread
+
+def handles(query: str) -> bool:
+    """Check whether a query should be served by the analytics replica."""
+    return query in REPLICA_QUERIES and get_analytics_replica() is not None
+
+def read_sql(engine, query: str, params: dict = None) -> pd.DataFrame:
+    """
+    Run an aggregate against the analytics replica. Returns None until the
+    refresher's first copy has succeeded, so the caller reads from Postgres
+    instead of an empty copy.
+    """
+    replica = get_analytics_replica()
+    if replica.last_sync_at is None:
+        return None
+    return replica.read_sql(query, params)
+
+def get_replica_status():
+    """
+    Get when the replica was last refreshed and how stale it is, or None
+    when the replica is not in use.
+    """
+    replica = get_analytics_replica()
+    if replica is None or replica.last_sync_at is None:
+        return None
+    age_seconds = (datetime.now() - replica.last_sync_at).total_seconds()
+    return {
+        'last_sync_at': replica.last_sync_at,
+        'age_seconds': age_seconds,
+        'stale': age_seconds > 2 * ANALYTICS_REFRESH_SECONDS,
+    }
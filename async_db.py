@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+import auth
+import functions as f
+import queries as q
+import shared_cache
+import statements
+
+try:
+    # sqlalchemy.ext.asyncio needs greenlet, which SQLAlchemy doesn't always install
+    import greenlet
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.util import await_only
+except ImportError:
+    create_async_engine = None
+
+# Tasks started with _spawn; kept so they aren't garbage collected
+_BACKGROUND_TASKS = set()
+
+@st.cache_resource
+def get_event_loop():
+    """
+    Get the event loop shared by all sessions in this process, running in
+    its own daemon thread. Runs only once per process.
+    """
+    # psycopg's async driver needs a selector loop (the Windows default is proactor)
+    loop = asyncio.SelectorEventLoop()
+    thread = threading.Thread(target=loop.run_forever, name="db-event-loop", daemon=True)
+    thread.start()
+    print("✅ Database event loop started")
+    return loop
+
+async def _warm_up_async_engine(engine, connections):
+    """Pre-open the async pool's connections, concurrently."""
+    async def _open():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_open() for _ in range(connections)))
+    print(f"✅ Warmed up {connections} async connections")
+
+@st.cache_resource
+def get_async_engine():
+    """
+    Get the async engine, or None when greenlet isn't installed. Its pool is
+    DB_ASYNC_POOL_SIZE connections taken out of DB_POOL_SIZE and warmed up
+    like the sync pool (the sync keepalive keeps the compute awake for both).
+    Its connections belong to the shared event loop, so only use it from
+    coroutines run through run_sync (which creates it first, outside the loop).
+    """
+    if create_async_engine is None or f.DB_ASYNC_POOL_SIZE <= 0:
+        return None
+    engine = create_async_engine(
+        f.DATABASE_URL,
+        pool_size=f.DB_ASYNC_POOL_SIZE,
+        max_overflow=0,
+        pool_pre_ping=True,
+        connect_args=statements.connect_args()
+    )
+    # Connects run on the event loop, so back off without blocking it
+    f.install_connect_retry(engine.sync_engine, sleep=lambda delay: await_only(asyncio.sleep(delay)))
+    loop = get_event_loop()
+    try:
+        asyncio.run_coroutine_threadsafe(
+            _warm_up_async_engine(engine, f.DB_ASYNC_POOL_SIZE), loop
+        ).result()
+    except Exception as e:
+        print(f"❌ Error warming up async connections: {e}")
+    return engine
+
+def run_sync(coro, timeout=None):
+    """Sync bridge for Streamlit pages: run a coroutine on the shared loop and wait for it."""
+    get_async_engine()
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
+
+def _spawn(coro):
+    """Start a background task from a coroutine already running on the shared loop."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    return task
+
+async def notify_table_changes_async(connection, tables):
+    """Async version of functions.notify_table_changes."""
+    for table_name in tables:
+        await connection.execute(
+            text("SELECT pg_notify(:channel, :table_name)"),
+            {'channel': shared_cache.INVALIDATION_CHANNEL, 'table_name': table_name}
+        )
+
+async def read_sql_async(query, params=None) -> pd.DataFrame:
+    """Run a SELECT, as a prepared statement if it is registered, and return a dataframe."""
+    if statements.is_registered(query):
+        return await statements.read_prepared_async(get_async_engine(), query, params)
+    async with get_async_engine().connect() as connection:
+        result = await connection.execute(text(query), params or {})
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+async def read_many_async(queries):
+    """Run independent SELECTs concurrently, each on its own pooled connection."""
+    return await asyncio.gather(*(read_sql_async(query, params) for query, params in queries))
+
+def read_many_cached(engine, queries):
+    """
+    Sync bridge for several independent reads, served like
+    functions.read_many_cached. The queries that miss the cache run
+    concurrently in one round of the event loop, or one by one on the sync
+    engine when the async engine isn't available.
+    """
+    if get_async_engine() is None:
+        return f.read_many_cached(engine, queries)
+    return f.read_many_cached(engine, queries, fetch=lambda misses: run_sync(read_many_async(misses)))
+
+async def _update_last_login(user_id):
+    try:
+        async with get_async_engine().begin() as connection:
+            await statements.execute_prepared_async(connection, q.UPDATE_LAST_LOGIN_SQL, {'user_id': user_id})
+            await notify_table_changes_async(connection, ['users'])
+        # SQLite write; keep it off the event loop
+        await asyncio.to_thread(f.invalidate_cached_tables, ['users'])
+    except Exception as e:
+        print(f"❌ Error updating last login: {e}")
+
+async def authenticate_user_async(username: str, password: str) -> dict:
+    """
+    Async version of auth.authenticate_user. bcrypt runs in a worker thread
+    so it doesn't stall the loop, and the last_login update is written in
+    the background instead of delaying the login.
+    """
+    try:
+        async with get_async_engine().connect() as connection:
+            rows = await statements.execute_prepared_async(connection, q.GET_USER_SQL, {'username': username})
+            user_data = rows[0] if rows else None
+
+        if user_data and await asyncio.to_thread(auth.verify_password, password, user_data.password_hash):
+            _spawn(_update_last_login(user_data.id))
+            return {
+                'id': user_data.id,
+                'username': user_data.username,
+                'email': user_data.email,
+                'role': user_data.role,
+                'created_at': user_data.created_at,
+                'last_login': datetime.now()
+            }
+        return None
+    except Exception as e:
+        print(f"❌ Authentication error: {e}")
+        return None
+
+def authenticate_user(username: str, password: str) -> dict:
+    """
+    Sync bridge for the login form: authenticate_user_async when the async
+    engine is available, otherwise auth.authenticate_user.
+    """
+    if f.get_initialized_db() is None:
+        return None
+    if get_async_engine() is None:
+        return auth.authenticate_user(username, password)
+    return run_sync(authenticate_user_async(username, password))
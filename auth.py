@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import text
 import functions as f
 import queries as q
+import statements
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
@@ -33,7 +34,9 @@ def create_user(username: str, email: str, password: str, role: str = 'user') ->
                     'role': role
                 }
             )
+            f.notify_table_changes(connection, ['users'])
             connection.commit()
+        f.invalidate_cached_tables(['users'])
         return True
     except Exception as e:
         st.error(f"Error creating user: {e}")
@@ -47,19 +50,23 @@ def authenticate_user(username: str, password: str) -> dict:
             return None
         
         with engine.connect() as connection:
-            result = connection.execute(
-                text(q.GET_USER_SQL),
+            rows = statements.execute_prepared(
+                connection,
+                q.GET_USER_SQL,
                 {'username': username}
             )
-            user_data = result.fetchone()
+            user_data = rows[0] if rows else None
             
             if user_data and verify_password(password, user_data.password_hash):
                 # Update last login
-                connection.execute(
-                    text(q.UPDATE_LAST_LOGIN_SQL),
+                statements.execute_prepared(
+                    connection,
+                    q.UPDATE_LAST_LOGIN_SQL,
                     {'user_id': user_data.id}
                 )
+                f.notify_table_changes(connection, ['users'])
                 connection.commit()
+                f.invalidate_cached_tables(['users'])
                 
                 return {
                     'id': user_data.id,
@@ -144,7 +151,7 @@ def get_all_users() -> pd.DataFrame:
         if engine is None:
             return pd.DataFrame()
         
-        return pd.read_sql_query(q.GET_ALL_USERS_SQL, engine)
+        return f.read_sql_cached(engine, q.GET_ALL_USERS_SQL)
     except Exception as e:
         st.error(f"Error fetching users: {e}")
         return pd.DataFrame()
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
+import async_db
 import auth
+import throttle
 
 def show_login_form():
     """Display login form."""
@@ -13,7 +15,18 @@ def show_login_form():
         
         if submit_button:
             if username and password:
-                user_data = auth.authenticate_user(username, password)
+                # Admission control runs before any user lookup or bcrypt work
+                rejection = throttle.admit_login(username)
+                if rejection:
+                    st.error(rejection)
+                    return
+                
+                with throttle.verification_slot() as admitted:
+                    if not admitted:
+                        st.error("The server is busy. Please try again in a moment.")
+                        return
+                    user_data = async_db.authenticate_user(username, password)
+                
                 if user_data:
                     auth.login_user(user_data)
                     st.success(f"Welcome back, {user_data['username']}!")
@@ -142,6 +155,25 @@ def show_user_management():
             st.metric("Managers", manager_count)
     else:
         st.info("No users found")
+    
+    # Login admission control counters (this server process only)
+    st.subheader("Login Throttling")
+    throttle_stats = throttle.get_throttle_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Logins Verified", throttle_stats['admitted'])
+    
+    with col2:
+        st.metric("Attempts Shed", throttle_stats['shed'])
+    
+    with col3:
+        rate_limited = (throttle_stats['rejected_user'] + throttle_stats['rejected_client']
+                        + throttle_stats['rejected_shared'])
+        st.metric("Rate Limited", rate_limited)
+    
+    with col4:
+        st.metric("Rejected While Busy", throttle_stats['rejected_busy'])
 
 def show_auth_sidebar():
     """Display authentication status in sidebar."""
@@ -0,0 +1,112 @@
+import hashlib
+from datetime import date
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+import functions as f
+import queries as q
+
+# Granularities supported by DATE_TRUNC, from finest to coarsest
+GRANULARITIES = ['day', 'week', 'month', 'quarter', 'year']
+
+# Upper bound on the number of points sent to a single chart
+MAX_CHART_POINTS = 120
+
+# Lower hire_date bound used when no period is selected
+ALL_TIME = date(1900, 1, 1)
+
+def get_hiring_timeline(engine, granularity: str = 'month', max_points: int = MAX_CHART_POINTS,
+                        since: date = ALL_TIME):
+    """
+    Get hires per period since a given date, aggregated in the database.
+    The since bound lets a partitioned employees table skip older partitions.
+
+    If the requested granularity would produce more than max_points buckets,
+    the next coarser granularity is used instead. Returns the dataframe and
+    the granularity that was actually applied.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    # Step up to a coarser granularity until the bucket count fits the budget
+    buckets = f.read_sql_cached(engine, q.HIRES_TIMELINE_BUCKETS_SQL, params={'since': since}).iloc[0]
+    for candidate in GRANULARITIES[GRANULARITIES.index(granularity):]:
+        if buckets[f"{candidate}_buckets"] <= max_points:
+            break
+
+    timeline_df = f.read_sql_cached(
+        engine,
+        q.HIRES_TIMELINE_SQL,
+        params={'granularity': candidate, 'max_points': max_points, 'since': since}
+    )
+    # The query returns the latest periods first so LIMIT keeps the newest data
+    timeline_df = timeline_df.sort_values('hire_period').reset_index(drop=True)
+    return timeline_df, candidate
+
+def get_department_breakdown(engine, max_points: int = 12):
+    """
+    Get employee counts per department, folding the smallest departments
+    into an 'Other' slice so the chart never has more than max_points slices.
+    """
+    return f.read_sql_cached(
+        engine, q.DEPARTMENT_BREAKDOWN_SQL, params={'max_points': max_points}
+    )
+
+def get_salary_summary(engine):
+    """Get salary count, min, max, median and 90th percentile in one row."""
+    return f.read_sql_cached(engine, q.SALARY_SUMMARY_SQL)
+
+def get_salary_histogram(engine, bucket_count: int = 20):
+    """Get salary histogram buckets computed with WIDTH_BUCKET in the database."""
+    return f.read_sql_cached(
+        engine, q.SALARY_HISTOGRAM_SQL, params={'bucket_count': bucket_count}
+    )
+
+def get_salary_by_department(engine):
+    """Get per-department boxplot statistics (min, quartiles, max)."""
+    return f.read_sql_cached(engine, q.SALARY_BY_DEPARTMENT_SQL)
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Return a stable hash of a dataframe's contents and column names."""
+    hasher = hashlib.sha1()
+    hasher.update(','.join(map(str, df.columns)).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
+
+@st.cache_resource(max_entries=32)
+def _build_figure(kind: str, fingerprint: str, _df: pd.DataFrame, layout: dict = None, **options):
+    """
+    Build a Plotly figure. Cached on the chart kind, data fingerprint and
+    options; the dataframe itself is not hashed by Streamlit (leading underscore).
+    The returned figure is shared between sessions and must not be mutated.
+    """
+    if kind == 'pie':
+        fig = px.pie(_df, **options)
+        fig.update_traces(textposition='inside', textinfo='percent+label')
+    elif kind == 'bar':
+        fig = px.bar(_df, **options)
+    elif kind == 'box':
+        # Boxes drawn from precomputed statistics, one row per box
+        fig = go.Figure(go.Box(
+            name=options.get('name', ''),
+            x=_df[options['x']],
+            lowerfence=_df[options['min']],
+            q1=_df[options['q1']],
+            median=_df[options['median']],
+            q3=_df[options['q3']],
+            upperfence=_df[options['max']],
+        ))
+        fig.update_layout(title=options.get('title'))
+    else:
+        raise ValueError(f"Unsupported chart kind: {kind}")
+
+    fig.update_layout(height=400, **(layout or {}))
+    return fig
+
+def cached_figure(kind: str, df: pd.DataFrame, layout: dict = None, **options):
+    """
+    Get a figure for this data, reusing the previous figure if neither the
+    data nor the options changed since the last rerun.
+    """
+    return _build_figure(kind, data_fingerprint(df), df, layout=layout, **options)
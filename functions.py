@@ -1,8 +1,20 @@
+import hashlib
+import importlib.util
+import re
+import threading
+import time
+from datetime import date
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text, table, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import make_url
 # import os
 # from dotenv import load_dotenv
 import streamlit as st
+import analytics
+import queries as q
+import shared_cache
+import statements
 
 # Load environment variables (for our database credentials)
 # load_dotenv()
@@ -10,11 +22,130 @@ import streamlit as st
 RAW_DATABASE_URL = st.secrets['DATABASE_URL']
 DATABASE_URL = RAW_DATABASE_URL.replace('postgresql://', 'postgresql+psycopg://', 1)
 
+# Connection pool and Neon cold-start settings (override in secrets.toml)
+# Connections this process may hold, sync and async pools together
+DB_POOL_SIZE = int(st.secrets.get('DB_POOL_SIZE', 5))
+# Extra sync connections opened under load and closed when returned
+DB_MAX_OVERFLOW = int(st.secrets.get('DB_MAX_OVERFLOW', 0))
+# Part of DB_POOL_SIZE kept for the async engine in async_db (only when greenlet is installed)
+DB_ASYNC_POOL_SIZE = (
+    min(int(st.secrets.get('DB_ASYNC_POOL_SIZE', 2)), DB_POOL_SIZE - 1)
+    if importlib.util.find_spec('greenlet') else 0
+)
+DB_SYNC_POOL_SIZE = DB_POOL_SIZE - DB_ASYNC_POOL_SIZE
+DB_CONNECT_RETRIES = int(st.secrets.get('DB_CONNECT_RETRIES', 3))
+# Neon suspends idle compute after 5 minutes by default; 0 disables the keepalive
+DB_KEEPALIVE_SECONDS = int(st.secrets.get('DB_KEEPALIVE_SECONDS', 240))
+# Create new databases with employees range-partitioned by year of hire_date
+EMPLOYEES_PARTITIONED = bool(st.secrets.get('EMPLOYEES_PARTITIONED', False))
+# Query result cache shared by all Streamlit processes on this host
+SHARED_CACHE_PATH = st.secrets.get('SHARED_CACHE_PATH', '.cache/query_cache.sqlite')
+# Safety net for missed notifications; writes normally evict entries immediately
+SHARED_CACHE_TTL = int(st.secrets.get('SHARED_CACHE_TTL', 600))
+# LISTEN needs a session connection; set this to the direct (non-pooler) URL
+DB_LISTEN_URL = st.secrets.get('DB_LISTEN_URL', RAW_DATABASE_URL)
+# Whole-table reads: pickling every row into SQLite costs more than it saves
+UNCACHED_QUERIES = {q.SELECT_ALL_DATA_SQL}
+
+# Connection latency instrumentation, shared by all sessions in this process
+CONNECTION_STATS = {
+    'cold_connect_ms': None,
+    'warm_connect_ms': [],
+    'keepalive_ms': None,
+    'keepalive_failures': 0,
+    'connect_retries': 0,
+}
+
+def install_connect_retry(engine, retries=DB_CONNECT_RETRIES, base_delay=0.5, sleep=time.sleep):
+    """
+    Make every new pooled connection retry transient connect errors with
+    exponential backoff. A suspended Neon compute can refuse the first
+    connection while it wakes up. Hooked into the engine's do_connect event
+    so every engine.connect() caller gets it. Async engines pass their
+    sync_engine and a sleep that doesn't block the event loop.
+    """
+    @event.listens_for(engine, "do_connect")
+    def _connect_with_retry(dialect, connection_record, cargs, cparams):
+        for attempt in range(retries + 1):
+            try:
+                return dialect.connect(*cargs, **cparams)
+            except dialect.loaded_dbapi.OperationalError as e:
+                if attempt == retries:
+                    raise
+                delay = base_delay * (2 ** attempt)
+                CONNECTION_STATS['connect_retries'] += 1
+                print(f"⚠️ Connection attempt {attempt + 1} failed, retrying in {delay:.1f}s: {e}")
+                sleep(delay)
+
+def _timed_ping(connection):
+    """Run a trivial query and return its round-trip time in milliseconds."""
+    start = time.perf_counter()
+    connection.execute(text("SELECT 1"))
+    return (time.perf_counter() - start) * 1000
+
+def warm_up_engine(engine, connections=DB_SYNC_POOL_SIZE):
+    """
+    Pre-open pooled connections so the first user query doesn't pay for the
+    TLS handshake. Run after test_connection, which has already woken the
+    compute, so these are timed as warm connects.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            start = time.perf_counter()
+            connection = engine.connect()
+            opened.append(connection)
+            _timed_ping(connection)
+            CONNECTION_STATS['warm_connect_ms'].append((time.perf_counter() - start) * 1000)
+    finally:
+        # Closing returns the connections to the pool, still open
+        for connection in opened:
+            connection.close()
+
+    print(f"✅ Warmed up {len(opened)} connections "
+          f"(cold: {CONNECTION_STATS['cold_connect_ms']:.0f} ms, "
+          f"warm avg: {get_connection_stats()['warm_connect_avg_ms']:.0f} ms)")
+
+def _keepalive_loop(engine, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with engine.connect() as connection:
+                CONNECTION_STATS['keepalive_ms'] = _timed_ping(connection)
+        except Exception as e:
+            CONNECTION_STATS['keepalive_failures'] += 1
+            print(f"❌ Keepalive failed: {e}")
+
+def start_keepalive(engine, interval=DB_KEEPALIVE_SECONDS):
+    """
+    Ping the database from a background thread every `interval` seconds so the
+    serverless compute is not suspended between user requests.
+    """
+    if interval <= 0:
+        return None
+    thread = threading.Thread(
+        target=_keepalive_loop, args=(engine, interval), name="db-keepalive", daemon=True
+    )
+    thread.start()
+    print(f"✅ Database keepalive started (every {interval}s)")
+    return thread
+
+def get_connection_stats():
+    """Get a snapshot of the connection latency instrumentation."""
+    stats = dict(CONNECTION_STATS)
+    warm = stats.pop('warm_connect_ms')
+    stats['warm_connect_avg_ms'] = sum(warm) / len(warm) if warm else 0.0
+    stats['warm_connections'] = len(warm)
+    return stats
+
 def test_connection(engine):
     try:
+        start = time.perf_counter()
         with engine.connect() as connection:
             result = connection.execute(text("SELECT version()"))
             version = result.fetchone()[0]
+            # First connection of the process: includes compute wake-up and TLS handshake
+            CONNECTION_STATS['cold_connect_ms'] = (time.perf_counter() - start) * 1000
             print(f"✅ Connected to database successfully!")
             print(f"Database version: {version}")  # Show first 50 characters
             return True
@@ -23,31 +154,302 @@ def test_connection(engine):
         print("Make sure your DATABASE_URL is correct!")
         return False
     
+@st.cache_resource
+def get_shared_cache():
+    """
+    Get the shared query cache and start this process's invalidation listener.
+    Runs only once per process.
+    """
+    cache = shared_cache.SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_TTL)
+    if '-pooler' in (make_url(DB_LISTEN_URL).host or ''):
+        print("⚠️ Cache invalidations are listened for through a '-pooler' URL and may not "
+              "arrive; set DB_LISTEN_URL to the direct connection string")
+    shared_cache.start_invalidation_listener(cache, DB_LISTEN_URL)
+    return cache
+
+def written_tables(query):
+    """Get the table written by an INSERT, UPDATE or DELETE statement."""
+    match = re.match(r'\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)', query, re.IGNORECASE)
+    return {match.group(1).lower()} if match else set()
+
+def read_tables(query):
+    """Get the tables a SELECT reads from (CTE names included, which is harmless)."""
+    return {name.lower() for name in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)', query, re.IGNORECASE)}
+
+def notify_table_changes(connection, tables):
+    """
+    Queue a NOTIFY for each written table. Postgres only delivers it when the
+    transaction commits, so a rolled-back write never evicts anything.
+    """
+    for table_name in tables:
+        connection.execute(
+            text("SELECT pg_notify(:channel, :table_name)"),
+            {'channel': shared_cache.INVALIDATION_CHANNEL, 'table_name': table_name}
+        )
+
+def invalidate_cached_tables(tables):
+    """Evict this host's cached results right away, without waiting for the NOTIFY."""
+    if tables:
+        get_shared_cache().invalidate(tables)
+
+def cache_key(query, params=None):
+    """Shared cache key for a query and its parameters."""
+    return hashlib.sha1(f"{query}|{sorted((params or {}).items())!r}".encode('utf-8')).hexdigest()
+
+def read_sql_cached(engine, query, params=None, ttl=SHARED_CACHE_TTL):
+    """
+    Run a SELECT through the shared cache. Results are kept until one of the
+    tables they read is written to (or ttl seconds pass). Dashboard
+    aggregates go to the analytics replica instead when it is turned on
+    and has synced.
+    """
+    return read_many_cached(engine, [(query, params)], ttl=ttl)[0]
+
+def read_many_cached(engine, queries, fetch=None, ttl=SHARED_CACHE_TTL):
+    """
+    Run several SELECTs through the analytics replica and the shared cache,
+    like read_sql_cached. The remaining queries are passed together to
+    fetch, which returns their dataframes in order (by default they are read
+    one by one). Accepts SQL strings or (sql, params) tuples, returns
+    dataframes in order.
+    """
+    queries = [query if isinstance(query, tuple) else (query, None) for query in queries]
+    results = [None] * len(queries)
+    misses = []
+    generations = {}
+    for i, (query, params) in enumerate(queries):
+        if analytics.handles(query):
+            results[i] = analytics.read_sql(engine, query, params)
+        if results[i] is None and query not in UNCACHED_QUERIES:
+            cache = get_shared_cache()
+            results[i] = cache.get(cache_key(query, params), max_age=ttl)
+            if results[i] is None:
+                # Taken before reading, so a write that lands meanwhile keeps the result out
+                generations[i] = cache.generation(read_tables(query))
+        if results[i] is None:
+            misses.append(i)
+
+    if misses:
+        if fetch is None:
+            fetched = [read_sql(engine, *queries[i]) for i in misses]
+        else:
+            fetched = fetch([queries[i] for i in misses])
+        for i, df in zip(misses, fetched):
+            query, params = queries[i]
+            if i in generations:
+                get_shared_cache().set(cache_key(query, params), df, read_tables(query), generations[i])
+            results[i] = df
+    return results
+
+def read_sql(engine, query, params=None):
+    """Run a SELECT, as a prepared statement if it is registered, and return a dataframe."""
+    if statements.is_registered(query):
+        return statements.read_prepared(engine, query, params)
+    return pd.read_sql_query(text(query), engine, params=params)
+
 def run_query(engine, query, params=None):
     try:
+        tables = written_tables(query)
         with engine.connect() as connection:
             if params:
                 connection.execute(text(query), params)
             else:
                 connection.execute(text(query))
+            notify_table_changes(connection, tables)
             connection.commit()
+        invalidate_cached_tables(tables)
         print(f"✅ Query run successfully!")
     except Exception as e:
         print(f"❌ Error running query: {e}")
 
+# Lightweight table construct for statements that need SQLAlchemy Core (bulk insert)
+EMPLOYEES_TABLE = table(
+    'employees',
+    column('id'),
+    column('name'),
+    column('email'),
+    column('department'),
+    column('salary'),
+    column('hire_date'),
+)
+
+def insert_employees_batch(engine, rows):
+    """
+    Insert many employees in a single transaction.
+
+    Rows are sent with SQLAlchemy's insertmanyvalues batching, so a whole
+    team is one round trip. Rows whose email already exists are skipped
+    (ON CONFLICT (email) DO NOTHING, or on employee_emails when employees is
+    partitioned). Returns one result dict per input row with a 'status' of
+    'inserted', 'duplicate' or 'error'.
+    """
+    if not rows:
+        return []
+
+    partitioned = employees_is_partitioned(engine)
+    if partitioned:
+        ensure_employee_partitions(engine, {row['hire_date'].year for row in rows})
+
+    stmt = pg_insert(EMPLOYEES_TABLE).returning(EMPLOYEES_TABLE.c.id, EMPLOYEES_TABLE.c.email)
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                if partitioned:
+                    # A partitioned table can't have UNIQUE (email), so emails are
+                    # claimed in employee_emails first and only the claimed rows inserted
+                    claimed = set(connection.execute(
+                        text(q.CLAIM_EMPLOYEE_EMAILS_SQL), {'emails': [row['email'] for row in rows]}
+                    ).scalars())
+                    new_rows = [row for row in rows if row['email'] in claimed]
+                    inserted = {}
+                    if new_rows:
+                        # Already claimed above; keep the trigger from claiming them again
+                        connection.execute(text(q.SKIP_EMAIL_CLAIMS_SQL), {'skip': 'on'})
+                        inserted = {row.email: row.id for row in connection.execute(stmt, new_rows)}
+                        connection.execute(text(q.SKIP_EMAIL_CLAIMS_SQL), {'skip': 'off'})
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=['email'])
+                    inserted = {row.email: row.id for row in connection.execute(stmt, rows)}
+                notify_table_changes(connection, ['employees'])
+        invalidate_cached_tables(['employees'])
+    except Exception as e:
+        print(f"❌ Error inserting employees: {e}")
+        return [
+            {'email': row['email'], 'id': None, 'status': 'error', 'message': str(e)}
+            for row in rows
+        ]
+
+    print(f"✅ Inserted {len(inserted)} of {len(rows)} employees!")
+    return [
+        {
+            'email': row['email'],
+            'id': inserted.get(row['email']),
+            'status': 'inserted' if row['email'] in inserted else 'duplicate',
+            'message': '' if row['email'] in inserted else 'Email already exists',
+        }
+        for row in rows
+    ]
+
+# Cached result of employees_is_partitioned, per process
+_EMPLOYEES_LAYOUT = {}
+
+def get_employees_relkind(engine):
+    """Get the employees table's relkind: 'p' partitioned, 'r' plain, None if missing."""
+    with engine.connect() as connection:
+        return connection.execute(text(q.EMPLOYEES_LAYOUT_SQL)).scalar()
+
+def employees_is_partitioned(engine):
+    """Check whether the employees table uses the partitioned layout."""
+    if 'partitioned' not in _EMPLOYEES_LAYOUT:
+        _EMPLOYEES_LAYOUT['partitioned'] = get_employees_relkind(engine) == 'p'
+        _EMPLOYEES_LAYOUT['years'] = set()
+    return _EMPLOYEES_LAYOUT['partitioned']
+
+def _create_employee_partitions(connection, years):
+    """Create yearly partitions that don't exist yet, using an open connection."""
+    existing = {
+        row.partition_name for row in connection.execute(text(q.EMPLOYEE_PARTITIONS_SQL))
+    }
+    created = []
+    for year in sorted(set(years)):
+        if f"employees_y{year}" in existing:
+            continue
+        for query in q.CREATE_EMPLOYEE_PARTITION_SQL:
+            connection.execute(text(query.format(year=int(year), next_year=int(year) + 1)))
+        created.append(year)
+    return created
+
+def ensure_employee_partitions(engine, years=None):
+    """
+    Make sure yearly partitions exist for the given hire years. By default
+    covers every year with data through next year. Does nothing for the
+    single-table layout.
+    """
+    if not employees_is_partitioned(engine):
+        return []
+
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                if years is None:
+                    bounds = connection.execute(
+                        text(q.EMPLOYEES_HIRE_YEARS_SQL.format(table='employees'))
+                    ).fetchone()
+                    current_year = date.today().year
+                    first_year = min(bounds.first_year or current_year, current_year)
+                    years = range(first_year, current_year + 2)
+                years = set(years) - _EMPLOYEES_LAYOUT['years']
+                created = _create_employee_partitions(connection, years) if years else []
+        _EMPLOYEES_LAYOUT['years'].update(years)
+    except Exception as e:
+        print(f"❌ Error creating employee partitions: {e}")
+        return []
+
+    if created:
+        print(f"✅ Created employee partitions for {created}")
+    return created
+
+def migrate_employees_to_partitioned(engine):
+    """
+    Move an existing single-table employees table to the partitioned layout
+    in one transaction. The old table is kept as employees_legacy; drop it
+    once the migrated data has been checked. Rows without a hire_date get
+    their created_at date, since hire_date is the partition key.
+    """
+    if employees_is_partitioned(engine):
+        print("✅ Employees table is already partitioned")
+        return True
+
+    try:
+        with engine.connect() as connection:
+            with connection.begin():
+                for query in q.MIGRATE_EMPLOYEES_RENAME_SQL + q.PARTITIONED_EMPLOYEES_SCHEMA:
+                    connection.execute(text(query))
+
+                bounds = connection.execute(
+                    text(q.EMPLOYEES_HIRE_YEARS_SQL.format(table='employees_legacy'))
+                ).fetchone()
+                current_year = date.today().year
+                first_year = min(bounds.first_year or current_year, current_year)
+                last_year = max(bounds.last_year or current_year, current_year)
+                _create_employee_partitions(connection, range(first_year, last_year + 2))
+
+                for query in q.MIGRATE_EMPLOYEES_COPY_SQL:
+                    connection.execute(text(query))
+    except Exception as e:
+        print(f"❌ Error migrating employees table: {e}")
+        return False
+
+    _EMPLOYEES_LAYOUT.clear()
+    print("✅ Employees table migrated to the partitioned layout (old data kept in employees_legacy)")
+    return True
+
 @st.cache_resource
 def get_database_engine():
     """
     Get cached database engine. This function runs only once per session.
     """
     # 1. Open connection with database
-    engine = create_engine(DATABASE_URL)
+    # pool_pre_ping replaces connections dropped while the compute was suspended
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_SYNC_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        connect_args=statements.connect_args()
+    )
+    install_connect_retry(engine)
     
     # 2. Test Connection
     if not test_connection(engine):
         st.error("Failed to connect to database!")
         return None
     
+    # 3. Warm up the pool, keep the compute awake and the analytics replica fresh
+    warm_up_engine(engine)
+    start_keepalive(engine)
+    analytics.start_refresher(engine)
+    
     print("✅ Database engine cached successfully!")
     return engine
 
@@ -61,10 +463,23 @@ def initialize_database_schema(DATABASE_SCHEMA):
         return None
         
     # 3. Create schema if it doesn't exist
+    if EMPLOYEES_PARTITIONED:
+        if get_employees_relkind(engine) == 'r':
+            # The partitioned DDL would fail against the plain table on every start
+            print("⚠️ EMPLOYEES_PARTITIONED is set but employees is a plain table; "
+                  "run migrate_employees_to_partitioned(engine) to convert it")
+        else:
+            # Runs first so the plain CREATE TABLE IF NOT EXISTS employees is a no-op
+            DATABASE_SCHEMA = q.PARTITIONED_EMPLOYEES_SCHEMA + list(DATABASE_SCHEMA)
     for query in DATABASE_SCHEMA:
         # Execute the SQL command
         run_query(engine, query)
     
+    # 4. Create yearly partitions for existing data and the coming year
+    _EMPLOYEES_LAYOUT.clear()
+    if EMPLOYEES_PARTITIONED and employees_is_partitioned(engine):
+        ensure_employee_partitions(engine)
+    
     print("✅ Database schema initialized!")
     return engine
 
@@ -80,20 +495,10 @@ def get_db_connection():
     """
     return get_database_engine()
 
-# Import the schema here to avoid importing it in every page
-try:
-    import queries as q
-    
-    @st.cache_resource
-    def get_initialized_db():
-        """
-        Most efficient way to get database connection.
-        Use this function in your pages instead of initialize_database().
-        """
-        return initialize_database_schema(q.DATABASE_SCHEMA)
-        
-except ImportError:
-    # If queries module is not available, provide a fallback
-    def get_initialized_db():
-        st.error("Database schema not found!")
-        return None
+@st.cache_resource
+def get_initialized_db():
+    """
+    Most efficient way to get database connection.
+    Use this function in your pages instead of initialize_database().
+    """
+    return initialize_database_schema(q.DATABASE_SCHEMA)
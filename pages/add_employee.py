@@ -1,9 +1,48 @@
 import streamlit as st
-from functions import run_query, initialize_database
+import pandas as pd
+from functions import run_query, initialize_database, insert_employees_batch
 import queries as q
 import auth
 import auth_ui
 
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "HR"]
+
+# Column limits from queries.DATABASE_SCHEMA
+MAX_NAME_LENGTH = 100
+MAX_EMAIL_LENGTH = 100
+MAX_DEPARTMENT_LENGTH = 50
+# DECIMAL(10, 2)
+MAX_SALARY = 99999999.99
+
+def validate_employee_rows(rows):
+    """Validate all rows at once and return a list of error messages."""
+    errors = []
+    seen_emails = set()
+    for i, row in enumerate(rows, start=1):
+        if not row.get('name'):
+            errors.append(f"Row {i}: name is required")
+        elif len(row['name']) > MAX_NAME_LENGTH:
+            errors.append(f"Row {i}: name must be at most {MAX_NAME_LENGTH} characters")
+        email = row.get('email') or ''
+        if not auth.validate_email(email):
+            errors.append(f"Row {i}: invalid email '{email}'")
+        elif len(email) > MAX_EMAIL_LENGTH:
+            errors.append(f"Row {i}: email must be at most {MAX_EMAIL_LENGTH} characters")
+        elif email.lower() in seen_emails:
+            errors.append(f"Row {i}: email '{email}' appears more than once")
+        seen_emails.add(email.lower())
+        if row.get('department') not in DEPARTMENTS:
+            errors.append(f"Row {i}: department is required")
+        elif len(row['department']) > MAX_DEPARTMENT_LENGTH:
+            errors.append(f"Row {i}: department must be at most {MAX_DEPARTMENT_LENGTH} characters")
+        if row.get('salary') is None or row['salary'] < 0:
+            errors.append(f"Row {i}: salary must be zero or more")
+        elif row['salary'] > MAX_SALARY:
+            errors.append(f"Row {i}: salary must be at most {MAX_SALARY:,.2f}")
+        if row.get('hire_date') is None:
+            errors.append(f"Row {i}: hire date is required")
+    return errors
+
 st.title("Add Employee")
 
 # Check authentication
@@ -16,23 +55,89 @@ auth_ui.show_navigation()
 # Initialize database (cached - runs only once per session)
 engine = initialize_database(q.DATABASE_SCHEMA)
 
-# Add employee form
-with st.form("add_employee_form"):
-    name = st.text_input("Name")
-    email = st.text_input("Email")
-    department = st.selectbox("Department", ["Engineering", "Marketing", "Sales", "HR"])
-    salary = st.number_input("Salary", min_value=0, step=1000)
-    hire_date = st.date_input("Hire Date")
-    submit_button = st.form_submit_button("Add Employee")
+mode = st.radio("Entry mode", ["Single employee", "Multiple employees"], horizontal=True)
+
+if mode == "Single employee":
+    # Add employee form
+    with st.form("add_employee_form"):
+        name = st.text_input("Name")
+        email = st.text_input("Email")
+        department = st.selectbox("Department", DEPARTMENTS)
+        salary = st.number_input("Salary", min_value=0, step=1000)
+        hire_date = st.date_input("Hire Date")
+        submit_button = st.form_submit_button("Add Employee")
+
+        if submit_button:
+            params = {
+                'name': name,
+                'email': email,
+                'department': department,
+                'salary': salary,
+                'hire_date': hire_date
+            }
+            print(f"Executing query with params: {params}")
+            run_query(engine, q.INSERT_DATA_SQL, params)
+            st.success("Employee added successfully!")
+else:
+    # Multi-row entry: validated together and written in one transaction
+    empty_rows = pd.DataFrame({
+        'name': pd.Series(dtype='str'),
+        'email': pd.Series(dtype='str'),
+        'department': pd.Series(dtype='str'),
+        'salary': pd.Series(dtype='float'),
+        'hire_date': pd.Series(dtype='datetime64[ns]'),
+    })
+
+    with st.form("add_employees_batch_form"):
+        edited_df = st.data_editor(
+            empty_rows,
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                'name': st.column_config.TextColumn("Name", max_chars=MAX_NAME_LENGTH, required=True),
+                'email': st.column_config.TextColumn("Email", max_chars=MAX_EMAIL_LENGTH, required=True),
+                'department': st.column_config.SelectboxColumn("Department", options=DEPARTMENTS, required=True),
+                'salary': st.column_config.NumberColumn("Salary", min_value=0, step=1000, required=True),
+                'hire_date': st.column_config.DateColumn("Hire Date", required=True),
+            },
+        )
+        submit_button = st.form_submit_button("Add Employees")
 
     if submit_button:
-        params = {
-            'name': name,
-            'email': email,
-            'department': department,
-            'salary': salary,
-            'hire_date': hire_date
-        }
-        print(f"Executing query with params: {params}")
-        run_query(engine, q.INSERT_DATA_SQL, params)
-        st.success("Employee added successfully!")
\ No newline at end of file
+        rows = [
+            {
+                'name': str(row['name']).strip() if pd.notna(row['name']) else '',
+                'email': str(row['email']).strip() if pd.notna(row['email']) else '',
+                'department': row['department'] if pd.notna(row['department']) else None,
+                'salary': row['salary'] if pd.notna(row['salary']) else None,
+                'hire_date': pd.to_datetime(row['hire_date']).date() if pd.notna(row['hire_date']) else None,
+            }
+            for row in edited_df.to_dict('records')
+        ]
+
+        if not rows:
+            st.error("Please enter at least one employee")
+        else:
+            errors = validate_employee_rows(rows)
+            if errors:
+                st.error("Please fix the following before submitting:\n\n" + "\n".join(f"- {e}" for e in errors))
+            else:
+                results_df = pd.DataFrame(insert_employees_batch(engine, rows))
+                inserted_count = (results_df['status'] == 'inserted').sum()
+                if inserted_count == len(rows):
+                    st.success(f"{inserted_count} employees added successfully!")
+                elif (results_df['status'] == 'error').any():
+                    st.error("No employees were added: the batch failed and was rolled back.")
+                else:
+                    st.warning(f"{inserted_count} of {len(rows)} employees added; the rest already exist.")
+
+                st.dataframe(
+                    results_df.rename(columns={
+                        'email': 'Email',
+                        'id': 'ID',
+                        'status': 'Status',
+                        'message': 'Message'
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
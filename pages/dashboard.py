@@ -3,7 +3,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import functions as f
+import analytics
+import async_db
+import charts
 import queries as q
+import statements
 import auth
 import auth_ui
 
@@ -32,11 +36,14 @@ engine = f.initialize_database(q.DATABASE_SCHEMA)
 
 # Dashboard Header
 st.title("👥 Employee Dashboard")
+
+# Filled in after the aggregates are read, once the replica has synced
+replica_status_placeholder = st.empty()
 st.markdown("---")
 
 # Check if we have data
 try:
-    total_employees_df = pd.read_sql_query(q.TOTAL_EMPLOYEES_SQL, engine)
+    total_employees_df = f.read_sql_cached(engine, q.TOTAL_EMPLOYEES_SQL)
     total_employees = total_employees_df['total_employees'].iloc[0]
     
     if total_employees == 0:
@@ -48,11 +55,26 @@ except Exception as e:
     st.stop()
 
 # Fetch all data for dashboard
-avg_salary_df = pd.read_sql_query(q.AVERAGE_SALARY_SQL, engine)
-dept_df = pd.read_sql_query(q.EMPLOYEES_PER_DEPARTMENT_SQL, engine)
-hire_dates_df = pd.read_sql_query(q.HIRE_DATES_TIMELINE_SQL, engine)
-recent_hires_df = pd.read_sql_query(q.RECENT_HIRES_SQL, engine)
-all_employees_df = pd.read_sql_query(q.SELECT_ALL_DATA_SQL, engine)
+# Independent reads: cache misses run concurrently on the async engine
+avg_salary_df, dept_df, recent_hires_df, all_employees_df = async_db.read_many_cached(engine, [
+    q.AVERAGE_SALARY_SQL,
+    q.EMPLOYEES_PER_DEPARTMENT_SQL,
+    q.RECENT_HIRES_SQL,
+    q.SELECT_ALL_DATA_SQL,
+])
+dept_chart_df = charts.get_department_breakdown(engine)
+
+replica_status = analytics.get_replica_status()
+if replica_status is not None:
+    replica_message = (
+        f"📦 Aggregates served from the analytics replica, refreshed "
+        f"{replica_status['last_sync_at'].strftime('%Y-%m-%d %H:%M:%S')} "
+        f"({replica_status['age_seconds'] / 60:.0f} min ago)"
+    )
+    if replica_status['stale']:
+        replica_status_placeholder.warning(replica_message)
+    else:
+        replica_status_placeholder.caption(replica_message)
 
 # Top Row - Key Metrics
 col1, col2, col3, col4 = st.columns(4)
@@ -99,15 +121,14 @@ col1, col2 = st.columns(2)
 with col1:
     st.subheader("📊 Employees per Department")
     if len(dept_df) > 0:
-        fig_dept = px.pie(
-            dept_df, 
-            values='employee_count', 
+        fig_dept = charts.cached_figure(
+            'pie',
+            dept_chart_df,
+            values='employee_count',
             names='department',
             title="Distribution by Department",
             color_discrete_sequence=px.colors.qualitative.Set3
         )
-        fig_dept.update_traces(textposition='inside', textinfo='percent+label')
-        fig_dept.update_layout(height=400)
         st.plotly_chart(fig_dept, use_container_width=True)
         
         # Department table
@@ -124,21 +145,40 @@ with col1:
 
 with col2:
     st.subheader("📈 Hiring Timeline")
+    timeline_col1, timeline_col2 = st.columns(2)
+    granularity = timeline_col1.selectbox(
+        "Granularity",
+        charts.GRANULARITIES[:-1],
+        index=charts.GRANULARITIES.index('month'),
+        format_func=str.title
+    )
+    period_years = timeline_col2.selectbox(
+        "Period",
+        [1, 2, 5, 10, None],
+        index=4,
+        format_func=lambda years: "All time" if years is None else f"Last {years} years" if years > 1 else "Last year"
+    )
+    since = charts.ALL_TIME if period_years is None else (pd.Timestamp.now() - pd.DateOffset(years=period_years)).date()
+    hire_dates_df, applied_granularity = charts.get_hiring_timeline(engine, granularity, since=since)
+    if applied_granularity != granularity:
+        st.caption(f"Showing hires per {applied_granularity} to stay within {charts.MAX_CHART_POINTS} points")
+
     if len(hire_dates_df) > 0:
-        fig_timeline = px.bar(
+        period_label = applied_granularity.title()
+        fig_timeline = charts.cached_figure(
+            'bar',
             hire_dates_df,
-            x='hire_month',
+            x='hire_period',
             y='hires_count',
-            title="Hires per Month",
-            labels={'hire_month': 'Month', 'hires_count': 'Number of Hires'},
+            title=f"Hires per {period_label}",
+            labels={'hire_period': period_label, 'hires_count': 'Number of Hires'},
             color='hires_count',
-            color_continuous_scale='Blues'
-        )
-        fig_timeline.update_layout(
-            xaxis_title="Month",
-            yaxis_title="Number of Hires",
-            height=400,
-            showlegend=False
+            color_continuous_scale='Blues',
+            layout={
+                'xaxis_title': period_label,
+                'yaxis_title': "Number of Hires",
+                'showlegend': False
+            }
         )
         st.plotly_chart(fig_timeline, use_container_width=True)
     else:
@@ -146,6 +186,54 @@ with col2:
 
 st.markdown("---")
 
+# Salary Analytics - statistics computed in the database, only summaries are fetched
+st.subheader("💰 Salary Analytics")
+salary_summary_df = charts.get_salary_summary(engine)
+salary_hist_df = charts.get_salary_histogram(engine)
+salary_dept_df = charts.get_salary_by_department(engine)
+
+if salary_summary_df['salary_count'].iloc[0] > 0:
+    salary_summary = salary_summary_df.iloc[0]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Median Salary", f"${salary_summary['median_salary']:,.2f}")
+    col2.metric("90th Percentile", f"${salary_summary['p90_salary']:,.2f}")
+    col3.metric("Lowest Salary", f"${salary_summary['min_salary']:,.2f}")
+    col4.metric("Highest Salary", f"${salary_summary['max_salary']:,.2f}")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        salary_hist_df['salary_range'] = salary_hist_df.apply(
+            lambda row: f"${row['bucket_start']:,.0f} - ${row['bucket_end']:,.0f}", axis=1
+        )
+        fig_salary_hist = charts.cached_figure(
+            'bar',
+            salary_hist_df,
+            x='salary_range',
+            y='employee_count',
+            title="Salary Distribution",
+            labels={'salary_range': 'Salary', 'employee_count': 'Employees'}
+        )
+        st.plotly_chart(fig_salary_hist, use_container_width=True)
+
+    with col2:
+        fig_salary_box = charts.cached_figure(
+            'box',
+            salary_dept_df,
+            x='department',
+            min='min_salary',
+            q1='q1_salary',
+            median='median_salary',
+            q3='q3_salary',
+            max='max_salary',
+            title="Salary by Department"
+        )
+        st.plotly_chart(fig_salary_box, use_container_width=True)
+else:
+    st.info("No salary data available")
+
+st.markdown("---")
+
 # Third Row - Recent Hires and All Employees
 col1, col2 = st.columns([1, 2])
 
@@ -198,4 +286,19 @@ with col2:
 
 # Footer
 st.markdown("---")
-st.markdown("*Dashboard last updated: " + pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S") + "*")
\ No newline at end of file
+st.markdown("*Dashboard last updated: " + pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S") + "*")
+
+connection_stats = f.get_connection_stats()
+if connection_stats['cold_connect_ms'] is not None:
+    st.caption(
+        f"Database connect latency: cold {connection_stats['cold_connect_ms']:.0f} ms, "
+        f"warm {connection_stats['warm_connect_avg_ms']:.0f} ms "
+        f"({connection_stats['connect_retries']} retries)"
+    )
+
+prepare_stats = statements.get_prepare_stats()
+if prepare_stats['enabled'] and prepare_stats['executions'] > 0:
+    st.caption(
+        f"Prepared statements: {prepare_stats['prepare_hits']} hits, "
+        f"{prepare_stats['prepares']} prepares ({prepare_stats['hit_ratio']:.0%} hit ratio)"
+    )
\ No newline at end of file
@@ -21,6 +21,146 @@ DATABASE_SCHEMA = [
         last_login TIMESTAMP
     );
     """,
+    """
+    CREATE INDEX IF NOT EXISTS employees_hire_date_idx ON employees (hire_date);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS login_throttle (
+        throttle_key VARCHAR(200) PRIMARY KEY,
+        window_start TIMESTAMP NOT NULL,
+        attempts INTEGER NOT NULL
+    );
+    """,
+]
+
+# Optional layout: employees range-partitioned by year of hire_date.
+# Unique constraints on a partitioned table must include the partition key,
+# so email uniqueness is kept in employee_emails, a plain table that triggers
+# fill in as employees are inserted, updated and deleted.
+PARTITIONED_EMPLOYEES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS employees (
+        id SERIAL,
+        name VARCHAR(100) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        department VARCHAR(50),
+        salary DECIMAL(10, 2),
+        hire_date DATE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, hire_date)
+    ) PARTITION BY RANGE (hire_date);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS employees_default PARTITION OF employees DEFAULT;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS employees_hire_date_idx ON employees (hire_date);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS employee_emails (
+        email VARCHAR(100) PRIMARY KEY
+    );
+    """,
+    """
+    CREATE OR REPLACE FUNCTION employees_claim_email() RETURNS trigger AS $$
+    BEGIN
+        -- Set by callers that have already claimed the emails (batch insert)
+        -- or are only moving rows between partitions
+        IF current_setting('employees.skip_email_claims', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+            DELETE FROM employee_emails WHERE email = OLD.email;
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.email IS DISTINCT FROM OLD.email) THEN
+            -- Raises unique_violation for a taken email, like the plain table's UNIQUE
+            INSERT INTO employee_emails (email) VALUES (NEW.email);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE OR REPLACE TRIGGER employees_claim_email
+        AFTER INSERT OR UPDATE OR DELETE ON employees
+        FOR EACH ROW EXECUTE FUNCTION employees_claim_email();
+    """,
+]
+
+SKIP_EMAIL_CLAIMS_SQL = "SELECT set_config('employees.skip_email_claims', :skip, true)"
+
+CLAIM_EMPLOYEE_EMAILS_SQL = """
+    INSERT INTO employee_emails (email)
+    SELECT UNNEST(CAST(:emails AS VARCHAR[]))
+    ON CONFLICT (email) DO NOTHING
+    RETURNING email
+"""
+
+EMPLOYEES_LAYOUT_SQL = """
+    SELECT relkind FROM pg_class WHERE oid = to_regclass('employees')
+"""
+
+EMPLOYEE_PARTITIONS_SQL = """
+    SELECT child.relname as partition_name
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = 'employees'::regclass
+"""
+
+EMPLOYEES_HIRE_YEARS_SQL = """
+    SELECT EXTRACT(YEAR FROM MIN(hire_date))::int as first_year,
+           EXTRACT(YEAR FROM MAX(hire_date))::int as last_year
+    FROM {table}
+"""
+
+# DDL can't take bind parameters; {year} is always formatted from an int.
+# Rows for the year are moved out of the default partition before attaching.
+CREATE_EMPLOYEE_PARTITION_SQL = [
+    # Moving rows keeps their emails, so leave employee_emails alone
+    "SELECT set_config('employees.skip_email_claims', 'on', true);",
+    """
+    CREATE TABLE employees_y{year}
+        (LIKE employees INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+    """,
+    """
+    WITH moved AS (
+        DELETE FROM employees_default
+        WHERE hire_date >= DATE '{year}-01-01' AND hire_date < DATE '{next_year}-01-01'
+        RETURNING *
+    )
+    INSERT INTO employees_y{year} SELECT * FROM moved;
+    """,
+    """
+    ALTER TABLE employees ATTACH PARTITION employees_y{year}
+        FOR VALUES FROM ('{year}-01-01') TO ('{next_year}-01-01');
+    """,
+    "SELECT set_config('employees.skip_email_claims', 'off', true);",
+]
+
+# Migration from the single-heap employees table, run in one transaction.
+# The legacy table is kept as employees_legacy until it is dropped by hand.
+MIGRATE_EMPLOYEES_RENAME_SQL = [
+    "ALTER TABLE employees RENAME TO employees_legacy;",
+    "ALTER TABLE employees_legacy RENAME CONSTRAINT employees_pkey TO employees_legacy_pkey;",
+    "ALTER TABLE employees_legacy RENAME CONSTRAINT employees_email_key TO employees_legacy_email_key;",
+    "ALTER INDEX IF EXISTS employees_hire_date_idx RENAME TO employees_legacy_hire_date_idx;",
+]
+
+# Copying fires the email trigger, which fills employee_emails
+MIGRATE_EMPLOYEES_COPY_SQL = [
+    """
+    INSERT INTO employees (id, name, email, department, salary, hire_date, created_at)
+    SELECT id, name, email, department, salary,
+           COALESCE(hire_date, created_at::date, CURRENT_DATE), created_at
+    FROM employees_legacy;
+    """,
+    """
+    SELECT setval(
+        pg_get_serial_sequence('employees', 'id'),
+        COALESCE((SELECT MAX(id) FROM employees_legacy), 0) + 1,
+        false
+    );
+    """,
 ]
 
 INSERT_DATA_SQL = """
@@ -42,18 +182,108 @@ EMPLOYEES_PER_DEPARTMENT_SQL = """
     ORDER BY employee_count DESC
 """
 
-HIRE_DATES_TIMELINE_SQL = """
-    SELECT 
-        DATE_TRUNC('month', hire_date) as hire_month,
+# Chart datasets: aggregated server-side and capped to a point budget.
+# Date filters compare hire_date directly (never DATE_TRUNC(hire_date)) so the
+# partitioned layout can prune partitions outside the requested range
+HIRES_TIMELINE_SQL = """
+    SELECT
+        DATE_TRUNC(:granularity, hire_date) as hire_period,
         COUNT(*) as hires_count
-    FROM employees 
-    GROUP BY DATE_TRUNC('month', hire_date)
-    ORDER BY hire_month
+    FROM employees
+    WHERE hire_date >= :since
+    GROUP BY 1
+    ORDER BY 1 DESC
+    LIMIT :max_points
+"""
+
+# Bucket counts for every granularity in one pass over the rows
+HIRES_TIMELINE_BUCKETS_SQL = """
+    SELECT
+        COUNT(DISTINCT DATE_TRUNC('day', hire_date)) as day_buckets,
+        COUNT(DISTINCT DATE_TRUNC('week', hire_date)) as week_buckets,
+        COUNT(DISTINCT DATE_TRUNC('month', hire_date)) as month_buckets,
+        COUNT(DISTINCT DATE_TRUNC('quarter', hire_date)) as quarter_buckets,
+        COUNT(DISTINCT DATE_TRUNC('year', hire_date)) as year_buckets
+    FROM employees
+    WHERE hire_date >= :since
+"""
+
+DEPARTMENT_BREAKDOWN_SQL = """
+    WITH counts AS (
+        SELECT department, COUNT(*) as employee_count,
+               ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC) as rank,
+               COUNT(*) OVER () as department_total
+        FROM employees
+        GROUP BY department
+    )
+    SELECT
+        CASE WHEN rank < :max_points OR department_total <= :max_points
+             THEN department ELSE 'Other' END as department,
+        SUM(employee_count) as employee_count
+    FROM counts
+    GROUP BY 1
+    ORDER BY employee_count DESC
 """
 
+# Salary analytics: every statistic is computed in the database
+SALARY_SUMMARY_SQL = """
+    SELECT
+        COUNT(salary) as salary_count,
+        MIN(salary) as min_salary,
+        MAX(salary) as max_salary,
+        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary) as median_salary,
+        PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY salary) as p90_salary
+    FROM employees
+"""
+
+SALARY_HISTOGRAM_SQL = """
+    WITH bounds AS (
+        -- width_bucket's upper bound is exclusive, so pad it to include the max
+        SELECT MIN(salary) as low, MAX(salary) + 0.01 as high
+        FROM employees
+        WHERE salary IS NOT NULL
+    ),
+    buckets AS (
+        SELECT WIDTH_BUCKET(e.salary, b.low, b.high, :bucket_count) as bucket,
+               COUNT(*) as employee_count
+        FROM employees e CROSS JOIN bounds b
+        WHERE e.salary IS NOT NULL
+        GROUP BY 1
+    )
+    -- Every bucket, empty ones included, so gaps show on the categorical axis
+    SELECT
+        s.bucket,
+        ROUND(b.low + (s.bucket - 1) * (b.high - b.low) / :bucket_count, 2) as bucket_start,
+        ROUND(b.low + s.bucket * (b.high - b.low) / :bucket_count, 2) as bucket_end,
+        COALESCE(k.employee_count, 0) as employee_count
+    FROM generate_series(1, :bucket_count) AS s(bucket)
+    CROSS JOIN bounds b
+    LEFT JOIN buckets k ON k.bucket = s.bucket
+    WHERE b.low IS NOT NULL
+    ORDER BY s.bucket
+"""
+
+SALARY_BY_DEPARTMENT_SQL = """
+    SELECT
+        department,
+        COUNT(salary) as salary_count,
+        MIN(salary) as min_salary,
+        PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY salary) as q1_salary,
+        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY salary) as median_salary,
+        PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY salary) as q3_salary,
+        MAX(salary) as max_salary
+    FROM employees
+    WHERE salary IS NOT NULL
+    GROUP BY department
+    ORDER BY median_salary DESC
+"""
+
+# Excluding NULLs lets the hire_date index serve the ORDER BY; on the
+# partitioned layout each partition's index scan stops after a few rows
 RECENT_HIRES_SQL = """
     SELECT name, department, hire_date, salary
     FROM employees
+    WHERE hire_date IS NOT NULL
     ORDER BY hire_date DESC
     LIMIT 10
 """
@@ -76,8 +306,81 @@ UPDATE_LAST_LOGIN_SQL = """
     WHERE id = :user_id
 """
 
+# Fixed one-minute windows shared by all replicas; one round trip per attempt
+COUNT_LOGIN_ATTEMPT_SQL = """
+    INSERT INTO login_throttle (throttle_key, window_start, attempts)
+    SELECT UNNEST(CAST(:throttle_keys AS VARCHAR[])), DATE_TRUNC('minute', NOW()), 1
+    ON CONFLICT (throttle_key) DO UPDATE SET
+        attempts = CASE WHEN login_throttle.window_start = EXCLUDED.window_start
+                        THEN login_throttle.attempts + 1 ELSE 1 END,
+        window_start = EXCLUDED.window_start
+    RETURNING throttle_key, attempts
+"""
+
+# Windows are one minute; older rows only matter until their key's next attempt
+PRUNE_LOGIN_THROTTLE_SQL = """
+    DELETE FROM login_throttle
+    WHERE window_start < DATE_TRUNC('minute', NOW()) - INTERVAL '10 minutes'
+"""
+
 GET_ALL_USERS_SQL = """
     SELECT id, username, email, role, created_at, last_login 
     FROM users 
     ORDER BY created_at DESC
-"""
\ No newline at end of file
+"""
+
+# Analytics replica: employees copied into a local DuckDB file
+ANALYTICS_SNAPSHOT_SQL = """
+    SELECT id, name, email, department, salary, hire_date, created_at
+    FROM employees
+    WHERE id > :last_id
+    ORDER BY id
+"""
+
+DUCKDB_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER,
+        name VARCHAR,
+        email VARCHAR,
+        department VARCHAR,
+        salary DECIMAL(10, 2),
+        hire_date DATE,
+        created_at TIMESTAMP);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        last_sync_at TIMESTAMP,
+        last_full_sync_at TIMESTAMP);
+    """,
+]
+
+# DuckDB has no WIDTH_BUCKET, so buckets are computed arithmetically
+DUCKDB_SALARY_HISTOGRAM_SQL = """
+    WITH bounds AS (
+        SELECT MIN(salary) as low, MAX(salary) + 0.01 as high
+        FROM employees
+        WHERE salary IS NOT NULL
+    ),
+    buckets AS (
+        SELECT LEAST(
+                   CAST(FLOOR((e.salary - b.low) * :bucket_count / (b.high - b.low)) AS INTEGER) + 1,
+                   :bucket_count
+               ) as bucket,
+               COUNT(*) as employee_count
+        FROM employees e CROSS JOIN bounds b
+        WHERE e.salary IS NOT NULL
+        GROUP BY 1
+    )
+    -- Every bucket, empty ones included, so gaps show on the categorical axis
+    SELECT
+        s.bucket,
+        ROUND(b.low + (s.bucket - 1) * (b.high - b.low) / :bucket_count, 2) as bucket_start,
+        ROUND(b.low + s.bucket * (b.high - b.low) / :bucket_count, 2) as bucket_end,
+        COALESCE(k.employee_count, 0) as employee_count
+    FROM generate_series(1, :bucket_count) AS s(bucket)
+    CROSS JOIN bounds b
+    LEFT JOIN buckets k ON k.bucket = s.bucket
+    WHERE b.low IS NOT NULL
+    ORDER BY s.bucket
+"""
@@ -0,0 +1,169 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import psycopg
+
+# Postgres channel carrying the name of each table that was written to
+INVALIDATION_CHANNEL = 'table_changed'
+
+class SharedCache:
+    """
+    Query result cache stored in a local SQLite file.
+
+    Every Streamlit process on the host opens the same file, so a result
+    computed by one replica is served to all of them. Entries are tagged
+    with the tables they read, and evicted by table when a write is notified.
+    """
+
+    def __init__(self, path: str, ttl: float = 600):
+        self.path = path
+        # Entries older than ttl are never served; purge() deletes them
+        self.ttl = ttl
+        self._purged_at = time.time()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_tables (
+                    key TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    PRIMARY KEY (key, table_name)
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS cache_tables_table_idx ON cache_tables (table_name)")
+            # Bumped on every invalidation; '*' is bumped when everything is cleared
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    table_name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        """One SQLite connection per thread; sqlite3 connections can't be shared."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            self._local.db = db
+        return db
+
+    def get(self, key: str, max_age: float):
+        """Return the cached value, or None if missing or older than max_age seconds."""
+        row = self._connect().execute(
+            "SELECT value, stored_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return pickle.loads(row[0])
+
+    def _generation(self, db, tables) -> int:
+        tables = list(tables) + ['*']
+        placeholders = ','.join('?' * len(tables))
+        return db.execute(
+            f"SELECT COALESCE(SUM(generation), 0) FROM cache_generations "
+            f"WHERE table_name IN ({placeholders})",
+            tables
+        ).fetchone()[0]
+
+    def _bump_generation(self, db, tables):
+        db.executemany(
+            "INSERT INTO cache_generations (table_name, generation) VALUES (?, 1) "
+            "ON CONFLICT (table_name) DO UPDATE SET generation = generation + 1",
+            [(table_name,) for table_name in tables]
+        )
+
+    def generation(self, tables) -> int:
+        """
+        Get the invalidation generation of a set of tables. Take it before
+        reading from the database and pass it to set().
+        """
+        return self._generation(self._connect(), tables)
+
+    def set(self, key: str, value, tables, generation: int = None):
+        """
+        Store a value tagged with the tables it was read from. If generation
+        is given and any of the tables was invalidated since it was taken,
+        the value may be stale and is not stored; returns whether it was.
+        """
+        with self._connect() as db:
+            # Take the write lock before checking, so no invalidation slips in between
+            db.execute("BEGIN IMMEDIATE")
+            if generation is not None and self._generation(db, tables) != generation:
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value), time.time())
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO cache_tables (key, table_name) VALUES (?, ?)",
+                [(key, table_name) for table_name in tables]
+            )
+        if time.time() - self._purged_at > self.ttl:
+            self.purge()
+        return True
+
+    def purge(self):
+        """Delete expired entries and table tags left without an entry."""
+        self._purged_at = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM cache_entries WHERE stored_at < ?", (self._purged_at - self.ttl,))
+            db.execute("DELETE FROM cache_tables WHERE key NOT IN (SELECT key FROM cache_entries)")
+
+    def invalidate(self, tables):
+        """Evict every entry that read from any of the given tables."""
+        tables = list(tables)
+        placeholders = ','.join('?' * len(tables))
+        evicted_keys = f"SELECT key FROM cache_tables WHERE table_name IN ({placeholders})"
+        with self._connect() as db:
+            db.execute(f"DELETE FROM cache_entries WHERE key IN ({evicted_keys})", tables)
+            # All of an evicted key's tags, not only the named tables' ones
+            db.execute(f"DELETE FROM cache_tables WHERE key IN ({evicted_keys})", tables)
+            self._bump_generation(db, tables)
+
+    def clear(self):
+        """Evict everything."""
+        with self._connect() as db:
+            db.execute("DELETE FROM cache_entries")
+            db.execute("DELETE FROM cache_tables")
+            self._bump_generation(db, ['*'])
+
+def _listen_loop(cache: SharedCache, conninfo: str):
+    delay = 1
+    while True:
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as connection:
+                connection.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                # Notifications sent while we weren't listening are lost
+                cache.clear()
+                delay = 1
+                print(f"✅ Listening for cache invalidations on '{INVALIDATION_CHANNEL}'")
+                for notify in connection.notifies():
+                    cache.invalidate([notify.payload])
+        except Exception as e:
+            print(f"❌ Cache invalidation listener failed, reconnecting in {delay}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+def start_invalidation_listener(cache: SharedCache, conninfo: str):
+    """
+    Start a daemon thread that LISTENs for table changes and evicts the
+    affected cache entries. Needs a direct (session) connection: NOTIFY is
+    not delivered through a transaction-mode pooler.
+    """
+    thread = threading.Thread(
+        target=_listen_loop, args=(cache, conninfo), name="cache-invalidation", daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,155 @@
+import pandas as pd
+import streamlit as st
+from psycopg.rows import namedtuple_row
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+import queries as q
+
+# Hot queries that are prepared server-side, by their name in queries.py
+PREPARED_QUERY_NAMES = [
+    # Login path
+    'GET_USER_SQL',
+    'UPDATE_LAST_LOGIN_SQL',
+    'GET_ALL_USERS_SQL',
+    # Dashboard
+    'TOTAL_EMPLOYEES_SQL',
+    'AVERAGE_SALARY_SQL',
+    'EMPLOYEES_PER_DEPARTMENT_SQL',
+    'RECENT_HIRES_SQL',
+    'HIRES_TIMELINE_SQL',
+    'HIRES_TIMELINE_BUCKETS_SQL',
+    'DEPARTMENT_BREAKDOWN_SQL',
+    'SALARY_SUMMARY_SQL',
+    'SALARY_HISTOGRAM_SQL',
+    'SALARY_BY_DEPARTMENT_SQL',
+]
+
+# Registry of prepared statements: name -> SQL, and SQL -> name for lookups
+PREPARED_STATEMENTS = {name: getattr(q, name) for name in PREPARED_QUERY_NAMES}
+_NAMES_BY_SQL = {sql: name for name, sql in PREPARED_STATEMENTS.items()}
+
+# psycopg prepares any other query automatically after this many executions
+# on the same connection; a negative value turns automatic preparing off
+DB_PREPARE_THRESHOLD = int(st.secrets.get('DB_PREPARE_THRESHOLD', 5))
+
+def _uses_transaction_pooler(database_url: str) -> bool:
+    """Neon's pooled connection strings have a '-pooler' host suffix."""
+    host = make_url(database_url).host or ''
+    return '-pooler' in host or bool(st.secrets.get('DB_TRANSACTION_POOLER', False))
+
+# A transaction-mode pooler may route each transaction to a different server
+# connection, where a statement prepared earlier doesn't exist. Only prepare
+# behind one if it tracks prepared statements (PgBouncer >= 1.21 with
+# max_prepared_statements set); opt in with DB_POOLER_SUPPORTS_PREPARE.
+PREPARE_ENABLED = (
+    not _uses_transaction_pooler(st.secrets['DATABASE_URL'])
+    or bool(st.secrets.get('DB_POOLER_SUPPORTS_PREPARE', False))
+)
+
+# Prepare metrics, shared by all sessions in this process
+PREPARE_STATS = {
+    'executions': 0,
+    'prepares': 0,
+    'prepare_hits': 0,
+    'unprepared': 0,
+}
+
+# Statements compiled to the driver's paramstyle, by name
+_COMPILED = {}
+
+def connect_args():
+    """Driver arguments for create_engine that apply the prepare settings."""
+    if not PREPARE_ENABLED or DB_PREPARE_THRESHOLD < 0:
+        return {'prepare_threshold': None}
+    return {'prepare_threshold': DB_PREPARE_THRESHOLD}
+
+def is_registered(query: str) -> bool:
+    """Check whether a query is in the prepared statement registry."""
+    return query in _NAMES_BY_SQL
+
+def _compiled_sql(connection, name: str) -> str:
+    """Compile a registered statement from :name binds to psycopg's %(name)s."""
+    if name not in _COMPILED:
+        _COMPILED[name] = str(text(PREPARED_STATEMENTS[name]).compile(dialect=connection.dialect))
+    return _COMPILED[name]
+
+def _count_prepare(pooled_connection, name: str):
+    """
+    Update the prepare metrics. Prepared statements live on the server
+    connection, so the pooled connection remembers which ones it already has.
+    """
+    prepared = pooled_connection.info.setdefault('prepared_statements', set())
+    PREPARE_STATS['executions'] += 1
+    if not PREPARE_ENABLED:
+        PREPARE_STATS['unprepared'] += 1
+    elif name in prepared:
+        PREPARE_STATS['prepare_hits'] += 1
+    else:
+        PREPARE_STATS['prepares'] += 1
+        prepared.add(name)
+
+def _run_prepared(connection, query: str, params: dict = None):
+    """Run a registered statement and return its column names and rows."""
+    name = _NAMES_BY_SQL[query] if query in _NAMES_BY_SQL else query
+    sql = _compiled_sql(connection, name)
+
+    # Make sure SQLAlchemy knows a transaction is open before using the driver directly
+    if not connection.in_transaction():
+        connection.begin()
+    _count_prepare(connection.connection, name)
+
+    with connection.connection.driver_connection.cursor(row_factory=namedtuple_row) as cursor:
+        cursor.execute(sql, params or {}, prepare=PREPARE_ENABLED)
+        if cursor.description is None:
+            return [], []
+        return [column.name for column in cursor.description], cursor.fetchall()
+
+def execute_prepared(connection, query: str, params: dict = None):
+    """
+    Execute a registered statement (its SQL constant from queries.py or its
+    registry name) on a SQLAlchemy connection using a server-side prepared
+    statement, and return its rows as namedtuples (empty for statements
+    without a result). Takes part in the connection's transaction, so
+    connection.commit() commits it as usual.
+    """
+    return _run_prepared(connection, query, params)[1]
+
+def read_prepared(engine, query: str, params: dict = None) -> pd.DataFrame:
+    """Run a registered SELECT as a prepared statement and return a dataframe."""
+    with engine.connect() as connection:
+        columns, rows = _run_prepared(connection, query, params)
+    return pd.DataFrame(rows, columns=columns)
+
+async def _run_prepared_async(connection, query: str, params: dict = None):
+    """Async version of _run_prepared, for a SQLAlchemy AsyncConnection."""
+    name = _NAMES_BY_SQL[query] if query in _NAMES_BY_SQL else query
+    sql = _compiled_sql(connection, name)
+
+    if not connection.in_transaction():
+        await connection.begin()
+    pooled_connection = await connection.get_raw_connection()
+    _count_prepare(pooled_connection, name)
+
+    async with pooled_connection.driver_connection.cursor(row_factory=namedtuple_row) as cursor:
+        await cursor.execute(sql, params or {}, prepare=PREPARE_ENABLED)
+        if cursor.description is None:
+            return [], []
+        return [column.name for column in cursor.description], await cursor.fetchall()
+
+async def execute_prepared_async(connection, query: str, params: dict = None):
+    """Async version of execute_prepared, for a SQLAlchemy AsyncConnection."""
+    return (await _run_prepared_async(connection, query, params))[1]
+
+async def read_prepared_async(engine, query: str, params: dict = None) -> pd.DataFrame:
+    """Async version of read_prepared, for a SQLAlchemy AsyncEngine."""
+    async with engine.connect() as connection:
+        columns, rows = await _run_prepared_async(connection, query, params)
+    return pd.DataFrame(rows, columns=columns)
+
+def get_prepare_stats():
+    """Get a snapshot of the prepare metrics, including the hit ratio."""
+    stats = dict(PREPARE_STATS)
+    prepared_executions = stats['prepares'] + stats['prepare_hits']
+    stats['hit_ratio'] = stats['prepare_hits'] / prepared_executions if prepared_executions else 0.0
+    stats['enabled'] = PREPARE_ENABLED
+    return stats
@@ -0,0 +1,162 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import streamlit as st
+from sqlalchemy import text
+import functions as f
+import queries as q
+
+# Per-username and per-client token buckets: burst size and refill per minute
+LOGIN_USER_BURST = int(st.secrets.get('LOGIN_USER_BURST', 5))
+LOGIN_USER_PER_MINUTE = float(st.secrets.get('LOGIN_USER_PER_MINUTE', 5))
+LOGIN_CLIENT_BURST = int(st.secrets.get('LOGIN_CLIENT_BURST', 20))
+LOGIN_CLIENT_PER_MINUTE = float(st.secrets.get('LOGIN_CLIENT_PER_MINUTE', 20))
+# Password verifications allowed to run at once in this process
+LOGIN_MAX_CONCURRENT = int(st.secrets.get('LOGIN_MAX_CONCURRENT', 2))
+# Also count attempts in the login_throttle table so limits hold across replicas
+LOGIN_SHARED_THROTTLE = bool(st.secrets.get('LOGIN_SHARED_THROTTLE', False))
+# Delete old login_throttle rows on about one in this many shared-throttle attempts
+LOGIN_THROTTLE_PRUNE_EVERY = int(st.secrets.get('LOGIN_THROTTLE_PRUNE_EVERY', 100))
+# Reverse proxies (load balancers) in front of the app that append to X-Forwarded-For.
+# Only the entries those proxies added can be trusted, counted from the right.
+TRUSTED_PROXY_HOPS = int(st.secrets.get('TRUSTED_PROXY_HOPS', 0))
+# Bound on tracked usernames, and separately on clients, so a spray of random
+# names can't grow memory or push out the other kind's buckets
+MAX_TRACKED_KEYS = 10000
+
+# Shed-work counters, shared by all sessions in this process
+THROTTLE_STATS = {
+    'admitted': 0,
+    'rejected_user': 0,
+    'rejected_client': 0,
+    'rejected_shared': 0,
+    'rejected_busy': 0,
+}
+
+class TokenBucket:
+    """Allows `burst` attempts at once, refilled at `per_minute` tokens a minute."""
+
+    def __init__(self, burst: int, per_minute: float):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+# Least recently used buckets first
+_user_buckets = OrderedDict()
+_client_buckets = OrderedDict()
+_buckets_lock = threading.Lock()
+_verification_slots = threading.BoundedSemaphore(LOGIN_MAX_CONCURRENT)
+# Set once the missing TRUSTED_PROXY_HOPS warning has been printed
+_proxy_warning = threading.Event()
+
+def _take(buckets, key, burst, per_minute) -> bool:
+    with _buckets_lock:
+        bucket = buckets.pop(key, None) or TokenBucket(burst, per_minute)
+        buckets[key] = bucket
+        if len(buckets) > MAX_TRACKED_KEYS:
+            buckets.popitem(last=False)
+        return bucket.take()
+
+def get_client_id():
+    """
+    Identify the client: the address the outermost trusted proxy saw
+    (TRUSTED_PROXY_HOPS entries from the right of X-Forwarded-For), or the
+    peer address when not behind a proxy. Entries further left are set by
+    the client and can be spoofed. Returns None when there is no address to
+    trust; a session id would not do, as a new session resets its bucket.
+    """
+    context = getattr(st, 'context', None)
+    if context is None:
+        return None
+    forwarded_for = context.headers.get('X-Forwarded-For')
+    if forwarded_for:
+        if TRUSTED_PROXY_HOPS <= 0:
+            # The peer address is the proxy's, shared by every user
+            if not _proxy_warning.is_set():
+                _proxy_warning.set()
+                print("⚠️ Requests arrive through a proxy but TRUSTED_PROXY_HOPS is 0; "
+                      "per-client login limits are off until it is set")
+            return None
+        addresses = [address.strip() for address in forwarded_for.split(',')]
+        if len(addresses) < TRUSTED_PROXY_HOPS:
+            return None
+        return addresses[-TRUSTED_PROXY_HOPS]
+    return getattr(context, 'ip_address', None)
+
+def _shared_attempts_allowed(username: str, client_id: str) -> bool:
+    """Count this attempt in the shared table and check the per-minute limits."""
+    engine = f.get_initialized_db()
+    if engine is None:
+        return True
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(
+                text(q.COUNT_LOGIN_ATTEMPT_SQL),
+                {'throttle_keys': [f"user:{username}"] + ([f"client:{client_id}"] if client_id else [])}
+            ).fetchall()
+            if random.random() * LOGIN_THROTTLE_PRUNE_EVERY < 1:
+                connection.execute(text(q.PRUNE_LOGIN_THROTTLE_SQL))
+            connection.commit()
+    except Exception as e:
+        # Fail open: the in-memory buckets still apply
+        print(f"❌ Shared login throttle unavailable: {e}")
+        return True
+    attempts = {row.throttle_key: row.attempts for row in rows}
+    return (attempts.get(f"user:{username}", 0) <= LOGIN_USER_PER_MINUTE
+            and attempts.get(f"client:{client_id}", 0) <= LOGIN_CLIENT_PER_MINUTE)
+
+def admit_login(username: str, client_id: str = None):
+    """
+    Decide whether a login attempt may go ahead, before any password check
+    or user lookup. Returns None when admitted, otherwise the reason to show.
+    Without a trustworthy client address only the per-user limits and the
+    verification slots apply.
+    """
+    username = username.strip().lower()
+    client_id = client_id or get_client_id()
+
+    if client_id and not _take(_client_buckets, client_id, LOGIN_CLIENT_BURST, LOGIN_CLIENT_PER_MINUTE):
+        THROTTLE_STATS['rejected_client'] += 1
+        return "Too many login attempts from your connection. Please wait a minute and try again."
+    if not _take(_user_buckets, username, LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE):
+        THROTTLE_STATS['rejected_user'] += 1
+        return "Too many login attempts for this account. Please wait a minute and try again."
+    if LOGIN_SHARED_THROTTLE and not _shared_attempts_allowed(username, client_id):
+        THROTTLE_STATS['rejected_shared'] += 1
+        return "Too many login attempts. Please wait a minute and try again."
+    return None
+
+@contextmanager
+def verification_slot():
+    """
+    Hold one of the LOGIN_MAX_CONCURRENT password verification slots.
+    Yields False straight away when all slots are busy instead of queueing.
+    """
+    acquired = _verification_slots.acquire(blocking=False)
+    if acquired:
+        THROTTLE_STATS['admitted'] += 1
+    else:
+        THROTTLE_STATS['rejected_busy'] += 1
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _verification_slots.release()
+
+def get_throttle_stats():
+    """Get a snapshot of the admission counters, including the total shed."""
+    stats = dict(THROTTLE_STATS)
+    stats['shed'] = sum(value for key, value in stats.items() if key.startswith('rejected_'))
+    return stats